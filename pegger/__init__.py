@@ -1 +1 @@
-from .rules import RuleAlias, String, Range, Any, Choices, Sequence, And, Not, ZeroOrMore, OneOrMore, Optional
+from .rules import RuleAlias, String, Range, Any, Token, Choices, Sequence, And, Not, ZeroOrMore, OneOrMore, Optional
@@ -0,0 +1,404 @@
+import argparse
+import importlib
+import re
+import sys
+from collections import deque
+
+from .rules import RuleAlias, RuleCollection, RuleWrapper, String, Range, Any, Token, Choices, Sequence, And, Not, ZeroOrMore, OneOrMore, Optional
+
+ERROR = 'error'
+WARNING = 'warning'
+
+
+class GrammarAnalysisException(Exception):
+    def __init__(self, issues):
+        super().__init__('\n'.join(str(issue) for issue in issues))
+        self.issues = issues
+
+
+class GrammarIssue:
+    """
+    Problem of a grammar found by the static analysis.
+    Errors make parsing loop forever or exceed the recursion limit, warnings make it needlessly slow.
+    """
+
+    def __init__(self, severity, path, message):
+        self.severity = severity
+        self.path = path
+        self.message = message
+
+    def __str__(self):
+        return '{}: {}: {}'.format(self.severity, self.path, self.message)
+
+
+def child_rules(rule):
+    """
+    Returns the direct subrules of a rule.
+    :param rule: The rule.
+    :return: List of subrules.
+    """
+    if isinstance(rule, RuleCollection):
+        return rule.rules
+    if isinstance(rule, (RuleWrapper, RuleAlias)) and rule.rule is not None:
+        return [rule.rule]
+    return []
+
+def reachable_rules(base_rule):
+    """
+    Collects all rules that are reachable from a base rule.
+    :param base_rule: The rule to start from.
+    :return: List of rules in depth-first order, starting with the base rule.
+    """
+    rules = []
+    visited = set()
+    stack = [base_rule]
+    while stack:
+        rule = stack.pop()
+        if rule in visited:
+            continue
+        visited.add(rule)
+        rules.append(rule)
+        stack.extend(reversed(child_rules(rule)))
+    return rules
+
+def nullable_rules(rules):
+    """
+    Computes which rules can succeed without consuming input.
+    :param rules: List of rules which contains all of their subrules, see reachable_rules.
+    :return: Set of nullable rules.
+    """
+    nullable = set()
+    changed = True
+    while changed:
+        changed = False
+        for rule in rules:
+            if rule not in nullable and _is_nullable(rule, nullable):
+                nullable.add(rule)
+                changed = True
+    return nullable
+
+def _is_nullable(rule, nullable):
+    if isinstance(rule, String):
+        return rule.s == ''
+    if isinstance(rule, (Range, Any)):
+        return False
+    if isinstance(rule, Choices):
+        return any(child_rule in nullable for child_rule in rule.rules)
+    if isinstance(rule, Sequence):
+        return all(child_rule in nullable for child_rule in rule.rules)
+    if isinstance(rule, (And, Not, ZeroOrMore, Optional)):
+        return True
+    return any(child_rule in nullable for child_rule in child_rules(rule))
+
+def first_sets(rules, nullable):
+    """
+    Computes the characters every non-empty match of a rule can start with.
+    Lookahead rules are ignored since they do not consume input.
+    :param rules: List of rules which contains all of their subrules, see reachable_rules.
+    :param nullable: Set of nullable rules, see nullable_rules.
+    :return: Dict from rule to a set of (start_ord, end_ord) character ranges and (kind,) tokens.
+    """
+    first = {rule: set() for rule in rules}
+    changed = True
+    while changed:
+        changed = False
+        for rule in rules:
+            size = len(first[rule])
+            for child_rule in _first_rules(rule, nullable):
+                first[rule] |= first[child_rule]
+            if isinstance(rule, String) and rule.s:
+                first[rule].add((ord(rule.s[0]), ord(rule.s[0])))
+            elif isinstance(rule, Range):
+                first[rule].add((rule.start_symbol_ord, rule.end_symbol_ord))
+            elif isinstance(rule, Any):
+                first[rule].add((0, sys.maxunicode))
+            elif isinstance(rule, Token):
+                first[rule].add((rule.kind,))
+            changed = changed or len(first[rule]) != size
+    return first
+
+def _first_rules(rule, nullable):
+    # subrules that can consume the first character of the rule
+    if isinstance(rule, (And, Not)):
+        return []
+    if isinstance(rule, Sequence):
+        first_rules = []
+        for child_rule in rule.rules:
+            first_rules.append(child_rule)
+            if child_rule not in nullable:
+                break
+        return first_rules
+    return child_rules(rule)
+
+def first_pattern(base_rule):
+    """
+    Compiles a regular expression that finds the positions where a non-empty match of a rule can start.
+    :param base_rule: The rule.
+    :return: The compiled pattern or None if a match can start with any character.
+    """
+    rules = reachable_rules(base_rule)
+    ranges = sorted(first for first in first_sets(rules, nullable_rules(rules))[base_rule] if len(first) == 2)
+    merged = []
+    for start_ord, end_ord in ranges:
+        if merged and start_ord <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end_ord)
+        else:
+            merged.append([start_ord, end_ord])
+    if merged == [[0, sys.maxunicode]]:
+        return None
+    if not merged:
+        # the rule never consumes input
+        return re.compile('(?!)')
+    return re.compile('[{}]'.format(''.join(
+        '\\U{:08x}-\\U{:08x}'.format(start_ord, end_ord) for start_ord, end_ord in merged)))
+
+def first_kinds(base_rule):
+    """
+    Computes the token kinds a non-empty match of a rule can start with.
+    :param base_rule: The rule.
+    :return: Set of token kinds or None if a match can start with any token.
+    """
+    rules = reachable_rules(base_rule)
+    first = first_sets(rules, nullable_rules(rules))[base_rule]
+    if any(len(first_item) == 2 for first_item in first):
+        return None
+    return set(kind for kind, in first)
+
+def infallible_rules(rules):
+    """
+    Computes which rules always succeed.
+    :param rules: List of rules which contains all of their subrules, see reachable_rules.
+    :return: Set of infallible rules.
+    """
+    infallible = set()
+    changed = True
+    while changed:
+        changed = False
+        for rule in rules:
+            if rule not in infallible and _is_infallible(rule, infallible):
+                infallible.add(rule)
+                changed = True
+    return infallible
+
+def _is_infallible(rule, infallible):
+    if isinstance(rule, String):
+        return rule.s == ''
+    if isinstance(rule, (Range, Any, Token, Not)):
+        return False
+    if isinstance(rule, Choices):
+        return any(child_rule in infallible for child_rule in rule.rules)
+    if isinstance(rule, Sequence):
+        return all(child_rule in infallible for child_rule in rule.rules)
+    if isinstance(rule, (ZeroOrMore, Optional)):
+        return True
+    return any(child_rule in infallible for child_rule in child_rules(rule))
+
+def rule_paths(base_rule):
+    """
+    Names every reachable rule by its shortest path from the base rule or from the closest named alias,
+    e.g. `<Expression> > Choices > Sequence[1] > ZeroOrMore`.
+    :param base_rule: The rule to start from.
+    :return: Dict from rule to path.
+    """
+    paths = {base_rule: _path_segment(base_rule, None)}
+    queue = deque([base_rule])
+    while queue:
+        rule = queue.popleft()
+        is_collection = isinstance(rule, RuleCollection)
+        for i, child_rule in enumerate(child_rules(rule)):
+            if child_rule in paths:
+                continue
+            segment = _path_segment(child_rule, i if is_collection else None)
+            if isinstance(child_rule, RuleAlias) and child_rule.name is not None:
+                paths[child_rule] = segment
+            else:
+                paths[child_rule] = '{} > {}'.format(paths[rule], segment)
+            queue.append(child_rule)
+    return paths
+
+def _path_segment(rule, index):
+    if isinstance(rule, RuleAlias) and rule.name is not None:
+        return '<{}>'.format(rule.name)
+    if index is None:
+        return rule.__class__.__name__
+    return '{}[{}]'.format(rule.__class__.__name__, index)
+
+def analyze(base_rule, *other_base_rules):
+    """
+    Statically analyzes the rules reachable from one or more base rules, every rule is analyzed once.
+    Reports repetitions of nullable rules and left recursion as errors,
+    unreachable alternatives and alternatives that start alike, which cause backtracking, as warnings.
+    :param base_rule: The rule to analyze.
+    :param other_base_rules: Further rules to analyze, e.g. the aliases that are not reachable from the base rule.
+    :return: List of GrammarIssue objects.
+    """
+    rules = []
+    paths = {}
+    for rule in (base_rule,) + other_base_rules:
+        rules.extend(reachable_rule for reachable_rule in reachable_rules(rule) if reachable_rule not in paths)
+        for reachable_rule, path in rule_paths(rule).items():
+            paths.setdefault(reachable_rule, path)
+    nullable = nullable_rules(rules)
+    infallible = infallible_rules(rules)
+    first = first_sets(rules, nullable)
+
+    issues = []
+    for rule in rules:
+        if isinstance(rule, (ZeroOrMore, OneOrMore)) and rule.rule in nullable:
+            issues.append(GrammarIssue(ERROR, paths[rule],
+                'repeats a rule that can succeed without consuming input, parsing loops forever'))
+    issues.extend(_left_recursion_issues(rules, nullable, paths))
+    for rule in rules:
+        if isinstance(rule, Choices):
+            issues.extend(_choices_issues(rule, infallible, first, paths))
+    return issues
+
+def _left_recursion_issues(rules, nullable, paths):
+    # strongly connected components of the graph of subrules that are applied at the same position
+    index = {}
+    low_link = {}
+    stack = []
+    on_stack = set()
+    issues = []
+    for root in rules:
+        if root in index:
+            continue
+        work = [(root, iter(_left_rules(root, nullable)))]
+        index[root] = low_link[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            rule, children = work[-1]
+            child_rule = next(children, None)
+            if child_rule is not None:
+                if child_rule not in index:
+                    index[child_rule] = low_link[child_rule] = len(index)
+                    stack.append(child_rule)
+                    on_stack.add(child_rule)
+                    work.append((child_rule, iter(_left_rules(child_rule, nullable))))
+                elif child_rule in on_stack:
+                    low_link[rule] = min(low_link[rule], index[child_rule])
+                continue
+            work.pop()
+            if work:
+                low_link[work[-1][0]] = min(low_link[work[-1][0]], low_link[rule])
+            if low_link[rule] != index[rule]:
+                continue
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member is rule:
+                    break
+            if len(component) > 1 or rule in _left_rules(rule, nullable):
+                component.sort(key=index.get)
+                names = [paths[member] for member in component if isinstance(member, RuleAlias) and member.name is not None]
+                issues.append(GrammarIssue(ERROR, paths[component[0]],
+                    'is left-recursive{}, parsing exceeds the recursion limit'.format(
+                        ' through ' + ', '.join(names) if names else '')))
+    return issues
+
+def _left_rules(rule, nullable):
+    # subrules that are applied at the starting position of the rule
+    if isinstance(rule, Sequence):
+        return _first_rules(rule, nullable)
+    return child_rules(rule)
+
+def _choices_issues(rule, infallible, first, paths):
+    issues = []
+    overlapping = []
+    for i, alternative in enumerate(rule.rules):
+        path = '{} > {}'.format(paths[rule], _path_segment(alternative, i))
+        previous = rule.rules[:i]
+        shadowing = next((j for j, other in enumerate(previous) if other in infallible), None)
+        if shadowing is not None:
+            issues.append(GrammarIssue(WARNING, path,
+                'is never tried, since alternative {} always succeeds'.format(shadowing)))
+            continue
+        literal = _literal(alternative)
+        shadowing = next((j for j, other in enumerate(previous)
+                          if literal is not None and _literal(other) is not None and literal.startswith(_literal(other))), None)
+        if shadowing is not None:
+            issues.append(GrammarIssue(WARNING, path,
+                'never succeeds, since alternative {} matches a prefix of it'.format(shadowing)))
+            continue
+        if any(_overlap(first[alternative], first[other]) for other in previous):
+            overlapping.append(i)
+    if overlapping:
+        issues.append(GrammarIssue(WARNING, paths[rule],
+            '{} {} can start like a previous alternative, which causes backtracking'.format(
+                'alternative' if len(overlapping) == 1 else 'alternatives', ', '.join(str(i) for i in overlapping))))
+    return issues
+
+def _literal(rule):
+    # the string matched by a rule that is equivalent to a String rule
+    while rule.action is None and rule.mode is None:
+        if isinstance(rule, String):
+            return rule.s
+        if not isinstance(rule, (Choices, Sequence)) or len(rule.rules) != 1:
+            return None
+        rule = rule.rules[0]
+    return None
+
+def _overlap(first, other_first):
+    for start in first:
+        for other_start in other_first:
+            if len(start) == 1 or len(other_start) == 1:
+                if start == other_start:
+                    return True
+            elif start[0] <= other_start[1] and other_start[0] <= start[1]:
+                return True
+    return False
+
+
+class _UndefinedActions(dict):
+    # the analysis does not execute actions, so every referenced action is accepted
+
+    def __contains__(self, name):
+        return True
+
+    def __missing__(self, name):
+        return None
+
+
+def main(args=None):
+    """
+    Command-line entry point, e.g. `python -m pegger.analysis grammar.peg`.
+    Prints the issues of a textual grammar definition and exits with status 1 if there are errors.
+    Every definition is analyzed unless a start alias is given.
+    """
+    from .grammar_parser import generate_grammar, GrammarDefinitionNotParsableException
+    from .lexer import TokenKindNotDefinedException, RuleNotApplicableToTokensException
+
+    parser = argparse.ArgumentParser(prog='python -m pegger.analysis', description='Statically analyzes a grammar definition.')
+    parser.add_argument('file', help='file containing the grammar definition')
+    parser.add_argument('--start', help='name of the alias to start from, defaults to every definition')
+    parser.add_argument('--lexer', help='lexer of the grammar as module:attribute, required to reference token kinds')
+    arguments = parser.parse_args(args)
+
+    lexer = None
+    if arguments.lexer is not None:
+        module_name, _, attribute = arguments.lexer.partition(':')
+        lexer = getattr(importlib.import_module(module_name), attribute)
+    try:
+        with open(arguments.file) as file:
+            grammar = generate_grammar(file.read(), actions=_UndefinedActions(), start=arguments.start, lexer=lexer)
+        if arguments.start is None:
+            issues = analyze(grammar.base_rule, *grammar.aliases.values())
+        else:
+            issues = grammar.analyze()
+    except GrammarDefinitionNotParsableException as exception:
+        # the exception names the alias whose definition is not parsable or which is not defined, if known
+        print('{}: {}: definition is not parsable{}'.format(
+            ERROR, arguments.file, ''.join(' at <{}>'.format(name) for name in exception.args)))
+        return 1
+    except (TokenKindNotDefinedException, RuleNotApplicableToTokensException) as exception:
+        print('{}: {}: {}: {}'.format(ERROR, arguments.file, exception.__class__.__name__, exception))
+        return 1
+    for issue in issues:
+        print(issue)
+    return 1 if any(issue.severity == ERROR for issue in issues) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
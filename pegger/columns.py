@@ -0,0 +1,120 @@
+import mmap
+import struct
+import sys
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ParseTreeColumns:
+    """
+    Parse tree stored as parallel int64 arrays in pre-order.
+    For every node it contains the id of its rule name, its start and end position,
+    the index of its parent node (-1 for the root) and its depth (0 for the root).
+    The rule name of a node is the name of the alias that returned it, e.g. `<Call>`,
+    or the class name of its rule for anonymous rules, e.g. `Sequence`.
+    """
+
+    MAGIC = b'PEGC'
+    HEADER = struct.Struct('<4scxxxQQ')
+    COLUMNS = ('rule_ids', 'starts', 'ends', 'parents', 'depths')
+
+    def __init__(self, rule_names, rule_ids, starts, ends, parents, depths):
+        self.rule_names = rule_names
+        self.rule_ids = rule_ids
+        self.starts = starts
+        self.ends = ends
+        self.parents = parents
+        self.depths = depths
+
+    def __len__(self):
+        return len(self.rule_ids)
+
+    @classmethod
+    def from_tree(cls, root):
+        """
+        Flattens a parse tree into columns.
+        The nodes are visited with two stacks of nodes and parent indices instead of creating an object per node.
+        :param root: The ParsingSuccess object of the root node.
+        :return: The ParseTreeColumns object.
+        """
+        rule_names = []
+        rule_name_ids = {}
+        columns = [array('q') for _ in cls.COLUMNS]
+        # bound methods, since this loop runs once per node
+        append_rule_id, append_start, append_end, append_parent, append_depth = (column.append for column in columns)
+        depths = columns[4]
+        nodes = [root]
+        parents = [-1]
+        pop_node, push_node = nodes.pop, nodes.append
+        pop_parent, push_parent = parents.pop, parents.append
+        index = 0
+        while nodes:
+            node = pop_node()
+            parent = pop_parent()
+            # alias names and rule types are keyed as they are, the names are only formatted once
+            rule_key = node.rule_type if node.name is None else node.name
+            rule_id = rule_name_ids.get(rule_key)
+            if rule_id is None:
+                rule_id = rule_name_ids[rule_key] = len(rule_names)
+                rule_names.append(node.rule_type.__name__ if node.name is None else '<{}>'.format(node.name))
+            append_rule_id(rule_id)
+            append_start(node.start_pos)
+            append_end(node.end_pos)
+            append_parent(parent)
+            append_depth(depths[parent] + 1 if parent >= 0 else 0)
+            for child in reversed(node.children):
+                push_node(child)
+                push_parent(index)
+            index += 1
+        return cls(rule_names, *columns)
+
+    def to_numpy(self):
+        """
+        Wraps the columns into NumPy arrays without copying them.
+        :return: Dict from column name to NumPy array.
+        """
+        if numpy is None:
+            raise ImportError('NumPy is required to convert the columns to NumPy arrays')
+        return {name: numpy.frombuffer(getattr(self, name), dtype=numpy.int64) for name in self.COLUMNS}
+
+    def save(self, path):
+        """
+        Writes the columns to a binary file, which can be memory-mapped by load.
+        :param path: The path of the file.
+        """
+        rule_names = '\n'.join(self.rule_names).encode('utf-8')
+        byte_order = b'<' if sys.byteorder == 'little' else b'>'
+        with open(path, 'wb') as file:
+            file.write(self.HEADER.pack(self.MAGIC, byte_order, len(self), len(rule_names)))
+            file.write(rule_names)
+            # the columns are aligned to 8 bytes
+            file.write(b'\0' * (-len(rule_names) % 8))
+            for name in self.COLUMNS:
+                file.write(getattr(self, name))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-maps a file written by save. The columns are read-only memoryviews of the file.
+        :param path: The path of the file.
+        :return: The ParseTreeColumns object.
+        """
+        with open(path, 'rb') as file:
+            buffer = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        magic, byte_order, length, names_length = cls.HEADER.unpack_from(buffer)
+        if magic != cls.MAGIC:
+            raise ValueError('Not a parse tree columns file')
+        if byte_order != (b'<' if sys.byteorder == 'little' else b'>'):
+            raise ValueError('The file was written with another byte order')
+        pos = cls.HEADER.size
+        rule_names = bytes(buffer[pos:pos + names_length]).decode('utf-8')
+        pos += names_length + (-names_length % 8)
+        columns = []
+        for _ in cls.COLUMNS:
+            columns.append(buffer[pos:pos + 8 * length].cast('q'))
+            pos += 8 * length
+        return cls(rule_names.split('\n') if rule_names else [], *columns)
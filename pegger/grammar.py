@@ -1,19 +1,170 @@
+from .analysis import ERROR, GrammarAnalysisException, analyze, first_pattern, first_kinds
+from .lexer import NotTokenizableException, check_character_rules
+from .parallel import parse_records
+from .results import ParsingFailure
+from .rules import Rule, Token
+
+
 class Grammar:
     """
     Provides parsing methods for a base Rule
     """
 
-    def __init__(self, base_rule):
+    def __init__(self, base_rule, aliases=None, lexer=None):
+        """
+        :param base_rule: The rule to parse with.
+        :param aliases: Dict of the named aliases of the grammar.
+        :param lexer: Optional Lexer object, the rules are then applied to its tokens instead of the characters.
+        """
+        if lexer is not None:
+            lexer.check(base_rule)
+        else:
+            check_character_rules(base_rule)
         self.base_rule = base_rule
+        self.aliases = {} if aliases is None else aliases
+        self.lexer = lexer
+
+    def select(self, name):
+        """
+        Creates a grammar with another alias as base rule, sharing all rules with this grammar.
+        :param name: The name of the alias.
+        :return: The Grammar object.
+        """
+        return Grammar(self.aliases[name], self.aliases, self.lexer)
+
+    def analyze(self):
+        """
+        Statically analyzes the rules of the grammar, see pegger.analysis.analyze.
+        :return: List of GrammarIssue objects.
+        """
+        return analyze(self.base_rule)
+
+    def check(self):
+        """
+        Statically analyzes the rules of the grammar and raises a GrammarAnalysisException if there are errors.
+        :return: List of GrammarIssue objects, which are warnings only.
+        """
+        issues = self.analyze()
+        errors = [issue for issue in issues if issue.severity == ERROR]
+        if errors:
+            raise GrammarAnalysisException(errors)
+        return issues
 
     def parse(self, string):
         """
         Parses an input string to an abstract syntax tree.
-        Just a wrapper for the parse method of the base rule.
+        Wraps the parse method of the base rule and tracks the furthest failure while parsing.
+        Results memoized by the rules outside of this method are parsed again, since their failures are unknown.
+        :param string: The string to parse.
+        :return: The AST or a ParsingFailure object, which evaluates to False.
+        """
+        if self.lexer is not None:
+            try:
+                string = self.lexer.tokenize(string)
+            except NotTokenizableException as exception:
+                return self._tokenizing_failure(string, exception.pos)
+        failure = ParsingFailure(string)
+        previous_tracker = Rule.failure_tracker
+        Rule.failure_tracker = failure
+        try:
+            result = self.base_rule.parse(string)
+        finally:
+            Rule.failure_tracker = previous_tracker
+        if result:
+            return result
+        return failure
+
+    def parse_records(self, string, record, resync, processes=None, chunks=None):
+        """
+        Parses a string consisting of a sequence of records in parallel processes, see pegger.parallel.parse_records.
+        The result is the same as a sequential parse with `ZeroOrMore(record)`.
         :param string: The string to parse.
-        :return: The AST.
+        :param record: The name of the alias of a single record or the rule itself.
+        :param resync: Regular expression whose matches end where a record probably starts.
+        :param processes: Number of processes, defaults to the number of CPUs.
+        :param chunks: Number of chunks the string is split into, defaults to the number of processes.
+        :return: The AST or a ParsingFailure object if the string cannot be tokenized, which evaluates to False.
         """
-        return self.base_rule.parse(string)
+        if isinstance(record, str):
+            record = self.aliases[record]
+        try:
+            return parse_records(record, string, resync, processes, chunks, self.lexer)
+        except NotTokenizableException as exception:
+            return self._tokenizing_failure(string, exception.pos)
+
+    def _tokenizing_failure(self, string, pos):
+        """
+        Creates the failure of a string that the lexer cannot tokenize, every token kind is expected there.
+        :param string: The string to parse.
+        :param pos: The position of the character that cannot be tokenized.
+        :return: The ParsingFailure object.
+        """
+        failure = ParsingFailure(string)
+        for kind in self.lexer.kind_names:
+            if kind not in self.lexer.skip:
+                failure.record(pos, Token(kind))
+        return failure
+
+    def parse_columns(self, string):
+        """
+        Parses an input string into a tree stored as parallel arrays, see ParseTreeColumns.
+        :param string: The string to parse.
+        :return: The ParseTreeColumns object or a ParsingFailure object, which evaluates to False.
+        """
+        result = self.parse(string)
+        if result:
+            return result.to_columns()
+        return result
+
+    def finditer(self, string):
+        """
+        Finds all non-overlapping matches of the grammar within a string, scanning from left to right.
+        Empty matches are skipped. Positions that cannot start a match are skipped using the FIRST set of the base rule,
+        and the results memoized while scanning are reused between positions, but not by other scans or parses.
+        With a lexer, characters that cannot be tokenized are skipped and end the matches that reach them.
+        :param string: The string to scan.
+        :return: Iterator over the ASTs of the matches.
+        """
+        if self.lexer is not None:
+            kinds = first_kinds(self.base_rule)
+            for tokens in self.lexer.segments(string):
+                yield from self._finditer(tokens, _kind_search(tokens, kinds))
+        else:
+            yield from self._finditer(string, _pattern_search(string, first_pattern(self.base_rule)))
+
+    def _finditer(self, string, search):
+        """
+        Finds all non-overlapping matches of the grammar within a string or a token stream.
+        :param string: The string or TokenStream object to scan.
+        :param search: Function returning the first position from a given one where a match can start, or None.
+        :return: Iterator over the ASTs of the matches.
+        """
+        # like a parse the scan memoizes the results of the rules per failure tracker, so they are freed afterwards
+        tracker = ParsingFailure(string)
+        pos = 0
+        while pos < len(string):
+            pos = search(pos)
+            if pos is None:
+                return
+            previous_tracker = Rule.failure_tracker
+            Rule.failure_tracker = tracker
+            try:
+                result = self.base_rule.parse(string, pos)
+            finally:
+                Rule.failure_tracker = previous_tracker
+            if result and result.end_pos > pos:
+                yield result
+                pos = result.end_pos
+            else:
+                pos += 1
+
+    def scan(self, string):
+        """
+        Finds all non-overlapping matches of the grammar within a string.
+        :param string: The string to scan.
+        :return: List of the ASTs of the matches.
+        """
+        return list(self.finditer(string))
 
     def match(self, string):
         """
@@ -30,4 +181,28 @@ class Grammar:
         :return: Boolean whether the string matches or not.
         """
         parse_result = self.parse(string)
-        return bool(parse_result) and parse_result.end_pos == len(string)
+        return bool(parse_result) and parse_result.end_pos == len(parse_result.string)
+
+
+def _pattern_search(string, pattern):
+    # finds the characters a match can start with, see first_pattern
+    if pattern is None:
+        return lambda pos: pos
+
+    def search(pos):
+        candidate = pattern.search(string, pos)
+        return None if candidate is None else candidate.start()
+    return search
+
+def _kind_search(tokens, kinds):
+    # finds the tokens a match can start with, see first_kinds
+    if kinds is None:
+        return lambda pos: pos
+    kind_ids = set(kind_id for kind_id, kind in enumerate(tokens.kind_names) if kind in kinds)
+
+    def search(pos):
+        for candidate in range(pos, len(tokens)):
+            if tokens.kinds[candidate] in kind_ids:
+                return candidate
+        return None
+    return search
@@ -1,52 +1,182 @@
 # Pairs are used as parsing success objects.
 # They consist of a parsing result object (which can be a Boolean) and an end_pos element.
+import re
+
 from pegger.grammar import Grammar
-from . import RuleAlias, String, Range, Any, Choices, Sequence, And, Not, ZeroOrMore, OneOrMore, Optional
+from .lexer import TokenKindNotDefinedException, RuleNotApplicableToTokensException
+from . import RuleAlias, String, Range, Any, Token, Choices, Sequence, And, Not, ZeroOrMore, OneOrMore, Optional
 
 
 class GrammarDefinitionNotParsableException(Exception):
     pass
 
-def generate_grammar(string):
-    base_rule = _grammar(string, 0)
-    if not base_rule:
-        raise GrammarDefinitionNotParsableException()
+class ActionNotDefinedException(Exception):
+    pass
+
+def generate_grammar(string, actions=None, start=None, lexer=None, check=False):
+    """
+    Generates a grammar from its textual definition.
+    The definitions are only located in advance, the rule of an alias is parsed when it is first reached.
+    :param string: The grammar definition.
+    :param actions: Dict of semantic actions referenced by name in the definition, e.g. `{int}`.
+    :param start: Name of the alias to use as base rule, defaults to the first definition.
+    :param lexer: Optional Lexer object, whose token kinds are referenced in the definition, e.g. `@Number`.
+                  Token kinds cannot be referenced without a lexer.
+    :param check: Whether to statically analyze the reachable rules and raise a GrammarAnalysisException on errors.
+    :return: The Grammar object.
+    """
+    if actions is None:
+        actions = {}
 
     # create alias to rule dict
     aliases = {}
-    visited = set()
-    for alias, rule in base_rule[0]:
-        alias.rule = rule
-        aliases[alias.name] = alias
+    first_alias = None
+    try:
+        definitions = _locate_definitions(string, actions, lexer)
+    finally:
+        _clear_memoization()
+    for name, start_pos, end_pos in definitions:
+        alias = LazyRuleAlias(name, string, start_pos, end_pos, aliases, actions)
+        aliases[name] = alias
+        if first_alias is None:
+            first_alias = alias
+
+    grammar = Grammar(first_alias if start is None else aliases[start], aliases, lexer)
+    if check:
+        grammar.check()
+    return grammar
+
+class LazyRuleAlias(RuleAlias):
+    """
+    Alias whose rule is parsed from the grammar definition when it is first reached.
+    """
 
-    for alias in aliases.values():
-        _replace_aliases(alias.rule, aliases, visited)
+    def __init__(self, name, string, start_pos, end_pos, aliases, actions):
+        super().__init__(name)
+        self.string = string
+        self.start_pos = start_pos
+        self.end_pos = end_pos
+        self.aliases = aliases
+        self.actions = actions
 
-    # return first alias
-    return Grammar(aliases[base_rule[0][0][0].name])
+    @property
+    def rule(self):
+        if self._rule is None and self.string is not None:
+            self._load()
+        return self._rule
+
+    @rule.setter
+    def rule(self, rule):
+        self._rule = self.cast_rule(rule)
+
+    def _load(self):
+        try:
+            expression_success = _expression(self.string, self.start_pos)
+        finally:
+            # the memoized rules must not be shared between grammars, since they are modified when they are loaded
+            _clear_memoization()
+        if not expression_success or expression_success[1] != self.end_pos:
+            raise GrammarDefinitionNotParsableException(self.name)
+        _replace_aliases(expression_success[0], self.aliases, self.actions, set())
+        self.string = None
+        self.rule = expression_success[0]
+
+_SPACING_PATTERN = r'(?:[ \t\r\n]|#[^\r\n]*)*'
+_CHAR_PATTERN = r'\\[nrt\'"\[\]\\]'
+_DEFINITION_TOKEN_PATTERN = re.compile(
+    r'(?:<(?P<definition>[a-zA-Z_][a-zA-Z_0-9]*)>' + _SPACING_PATTERN + r':='
+    r'|<(?P<reference>[a-zA-Z_][a-zA-Z_0-9]*)>'
+    r'|@(?P<token>[a-zA-Z_][a-zA-Z_0-9]*)'
+    r"|(?P<characters>'(?:" + _CHAR_PATTERN + r"|[^'\\])*'"
+    r'|"(?:' + _CHAR_PATTERN + r'|[^"\\])*"'
+    r'|\[(?:' + _CHAR_PATTERN + r'|[^\]\\])*\])'
+    r'|\{(?P<action>[a-zA-Z_][a-zA-Z_0-9]*)\}'
+    r'|[/&!~$\-?*+().])' + _SPACING_PATTERN)
+
+def _locate_definitions(string, actions, lexer=None):
+    """
+    Locates the definitions of a grammar without parsing their expressions.
+    :param string: The grammar definition.
+    :param actions: Dict of semantic actions, referenced actions have to be defined.
+    :param lexer: Optional Lexer object, referenced token kinds have to be defined and characters cannot be matched.
+    :return: List of (name, start_pos, end_pos) triples, spanning the expression of each definition.
+    """
+    definitions = []
+    references = []
+    if lexer is not None:
+        kinds = set(kind for kind in lexer.kind_names if kind not in lexer.skip)
+    pos = _spacing(string, 0)[1]
+    while pos < len(string):
+        token = _DEFINITION_TOKEN_PATTERN.match(string, pos)
+        if not token or not (definitions or token.group('definition')):
+            raise GrammarDefinitionNotParsableException()
+        if token.group('definition'):
+            if definitions:
+                definitions[-1][2] = pos
+            definitions.append([token.group('definition'), token.end(), len(string)])
+        if token.group('action') and token.group('action') not in actions:
+            raise ActionNotDefinedException(token.group('action'))
+        if token.group('reference'):
+            references.append(token.group('reference'))
+        if lexer is None:
+            if token.group('token'):
+                raise RuleNotApplicableToTokensException('@{} requires a lexer'.format(token.group('token')))
+        else:
+            if token.group('token') and token.group('token') not in kinds:
+                raise TokenKindNotDefinedException(token.group('token'))
+            if token.group('characters') and token.group('characters') not in ('""', "''"):
+                raise RuleNotApplicableToTokensException(token.group('characters'))
+        pos = token.end()
+    if not definitions:
+        raise GrammarDefinitionNotParsableException()
+    # references are resolved when the rules are loaded, so undefined ones have to be found in advance
+    names = set(definition[0] for definition in definitions)
+    for name in references:
+        if name not in names:
+            raise GrammarDefinitionNotParsableException(name)
+    return definitions
 
-def _replace_aliases(rule, aliases, visited):
+def _replace_aliases(rule, aliases, actions, visited):
     if rule in visited:
         return
     visited.add(rule)
+    if hasattr(rule, 'action_name'):
+        if rule.action_name not in actions:
+            raise ActionNotDefinedException(rule.action_name)
+        rule.set_action(actions[rule.action_name])
+    if _is_reference(rule):
+        # the rule of an alias is resolved when it is loaded
+        return
     if hasattr(rule, 'rule'):
-        if isinstance(rule.rule, RuleAlias):
+        if _is_reference(rule.rule):
             rule.rule = aliases[rule.rule.name]
-        _replace_aliases(rule.rule, aliases, visited)
+        _replace_aliases(rule.rule, aliases, actions, visited)
     if hasattr(rule, 'rules'):
         for i, child_rule in enumerate(rule.rules):
-            if isinstance(child_rule, RuleAlias):
+            if _is_reference(child_rule):
                 child_rule = rule.rules[i] = aliases[child_rule.name]
-            _replace_aliases(child_rule, aliases, visited)
+            _replace_aliases(child_rule, aliases, actions, visited)
+
+def _is_reference(rule):
+    # anonymous aliases are created by the node mode prefixes and are kept
+    return isinstance(rule, RuleAlias) and rule.name is not None
+
+# memoization dicts of the parsing functions, see _clear_memoization
+_memoization_dicts = []
 
 def memoize(f):
     memoization_dict = {}
+    _memoization_dicts.append(memoization_dict)
     def helper(*args):
         if args in memoization_dict:
             return memoization_dict[args]
         return memoization_dict.setdefault(args, f(*args))
     return helper
 
+def _clear_memoization():
+    for memoization_dict in _memoization_dicts:
+        memoization_dict.clear()
+
 ### Hierarchical syntax
 @memoize
 def _grammar(string, start_pos):
@@ -104,6 +234,10 @@ def _sequence(string, start_pos):
             sequence.add_rule(prefix_success_2[0])
             continue
         break
+    action_success = _action(string, prefix_success[1])
+    if action_success:
+        sequence.action_name = action_success[0]
+        return sequence, action_success[1]
     return sequence, prefix_success[1]
 
 @memoize
@@ -118,6 +252,21 @@ def _prefix(string, start_pos):
         suffix_success = _suffix(string, not_success[1])
         if suffix_success:
             return Not(suffix_success[0]), suffix_success[1]
+    hide_success = _substring(string, start_pos, '~')
+    if hide_success:
+        suffix_success = _suffix(string, hide_success[1])
+        if suffix_success:
+            return RuleAlias(None, suffix_success[0]).hide(), suffix_success[1]
+    token_success = _substring(string, start_pos, '$')
+    if token_success:
+        suffix_success = _suffix(string, token_success[1])
+        if suffix_success:
+            return RuleAlias(None, suffix_success[0]).as_token(), suffix_success[1]
+    drop_success = _substring(string, start_pos, '-')
+    if drop_success:
+        suffix_success = _suffix(string, drop_success[1])
+        if suffix_success:
+            return RuleAlias(None, suffix_success[0]).drop(), suffix_success[1]
     suffix_success = _suffix(string, start_pos)
     if suffix_success:
         return suffix_success
@@ -151,6 +300,9 @@ def _primary(string, start_pos):
             close_success = _substring(string, expression_success[1], ')')
             if close_success:
                 return expression_success[0], close_success[1]
+    token_success = _token(string, start_pos)
+    if token_success:
+        return token_success
     literal_success = _literal(string, start_pos)
     if literal_success:
         return literal_success
@@ -179,6 +331,39 @@ def _identifier(string, start_pos):
                 if spacing_success:
                     return RuleAlias(string[start_pos + 1:ident_cont_success[1]]), spacing_success[1]
 
+@memoize
+def _token(string, start_pos):
+    if string[start_pos:start_pos + 1] == '@':
+        ident_start_success = _ident_start(string, start_pos + 1)
+        if ident_start_success:
+            ident_cont_success = True, ident_start_success[1]
+            while True:
+                ident_cont_success_2 = _ident_cont(string, ident_cont_success[1])
+                if ident_cont_success_2:
+                    ident_cont_success = ident_cont_success_2
+                    continue
+                break
+            spacing_success = _spacing(string, ident_cont_success[1])
+            if spacing_success:
+                return Token(string[start_pos + 1:ident_cont_success[1]]), spacing_success[1]
+
+@memoize
+def _action(string, start_pos):
+    if string[start_pos:start_pos + 1] == '{':
+        ident_start_success = _ident_start(string, start_pos + 1)
+        if ident_start_success:
+            ident_cont_success = True, ident_start_success[1]
+            while True:
+                ident_cont_success_2 = _ident_cont(string, ident_cont_success[1])
+                if ident_cont_success_2:
+                    ident_cont_success = ident_cont_success_2
+                    continue
+                break
+            if string[ident_cont_success[1]:ident_cont_success[1] + 1] == '}':
+                spacing_success = _spacing(string, ident_cont_success[1] + 1)
+                if spacing_success:
+                    return string[start_pos + 1:ident_cont_success[1]], spacing_success[1]
+
 @memoize
 def _ident_start(string, start_pos):
     if len(string) > start_pos:
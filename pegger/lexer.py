@@ -0,0 +1,192 @@
+import re
+from array import array
+
+from .rules import RuleAlias, RuleCollection, RuleWrapper, String, Range, Token
+
+
+class NotTokenizableException(Exception):
+    def __init__(self, pos):
+        super().__init__(pos)
+        self.pos = pos
+
+class TokenKindNotDefinedException(Exception):
+    pass
+
+class RuleNotApplicableToTokensException(Exception):
+    pass
+
+class TokenPatternNotValidException(Exception):
+    def __init__(self, kind, message):
+        super().__init__('{}: {}'.format(kind, message))
+        self.kind = kind
+
+
+class Lexer:
+    """
+    Splits a string into tokens in a single pass before parsing.
+    The rules of the grammar then match token kinds with `Token` rules instead of characters.
+    """
+
+    def __init__(self, definitions, skip=()):
+        """
+        :param definitions: List of (kind, pattern) pairs, the first pattern that matches determines the kind.
+                            The patterns cannot match the empty string and cannot share group names.
+        :param skip: Kinds of tokens that are discarded, e.g. whitespace and comments.
+        """
+        self.kind_names = [kind for kind, _ in definitions]
+        self.skip = set(skip)
+        # the outer group of every definition, the patterns may contain groups on their own
+        self.group_kinds = {}
+        group = 1
+        group_names = {}
+        for kind_id, (kind, pattern) in enumerate(definitions):
+            try:
+                compiled_pattern = re.compile(pattern)
+            except re.error as e:
+                raise TokenPatternNotValidException(kind, str(e))
+            if compiled_pattern.match(''):
+                raise TokenPatternNotValidException(kind, 'matches the empty string')
+            for name in compiled_pattern.groupindex:
+                if name in group_names:
+                    raise TokenPatternNotValidException(kind, 'group name {} is already used by {}'.format(name, group_names[name]))
+                group_names[name] = kind
+            self.group_kinds[group] = kind_id
+            group += compiled_pattern.groups + 1
+        self.pattern = re.compile('|'.join('({})'.format(pattern) for _, pattern in definitions))
+
+    def tokenize(self, string):
+        """
+        Splits a string into tokens.
+        :param string: The string to split.
+        :return: The TokenStream object.
+        """
+        tokens, end_pos = self._tokenize(string, 0)
+        if end_pos < len(string):
+            raise NotTokenizableException(end_pos)
+        return tokens
+
+    def segments(self, string):
+        """
+        Splits the parts of a string between the characters that cannot be tokenized into tokens.
+        :param string: The string to split.
+        :return: Iterator over the TokenStream objects of the parts.
+        """
+        pos = 0
+        while pos < len(string):
+            tokens, end_pos = self._tokenize(string, pos)
+            if len(tokens):
+                yield tokens
+            pos = end_pos + 1
+
+    def _tokenize(self, string, start_pos):
+        """
+        Splits a string into tokens until a character cannot be tokenized.
+        :param string: The string to split.
+        :param start_pos: Starting position within the string.
+        :return: The TokenStream object and the position where tokenizing stopped.
+        """
+        tokens = TokenStream(string, self.kind_names)
+        skip_ids = set(kind_id for kind_id, kind in enumerate(self.kind_names) if kind in self.skip)
+        pos = start_pos
+        while pos < len(string):
+            match = self.pattern.match(string, pos)
+            if match is None or match.end() == pos:
+                break
+            kind_id = self.group_kinds[match.lastindex]
+            if kind_id not in skip_ids:
+                tokens.kinds.append(kind_id)
+                tokens.starts.append(pos)
+                tokens.ends.append(match.end())
+            pos = match.end()
+        # the token streams of the parts of a string differ by their start position
+        tokens.hash = hash((string, start_pos, tokens.kinds.tobytes()))
+        return tokens, pos
+
+    def check(self, base_rule):
+        """
+        Checks that the rules reachable from a base rule can be applied to the tokens of the lexer.
+        The rules of aliases which are not loaded yet are not checked, generate_grammar checks their definitions.
+        :param base_rule: The rule to start from.
+        """
+        kinds = set(kind for kind in self.kind_names if kind not in self.skip)
+        for rule in _loaded_rules(base_rule):
+            if isinstance(rule, String) and rule.s or isinstance(rule, Range):
+                raise RuleNotApplicableToTokensException(str(rule))
+            if isinstance(rule, Token) and rule.kind not in kinds:
+                raise TokenKindNotDefinedException(rule.kind)
+
+
+def check_character_rules(base_rule):
+    """
+    Checks that the rules reachable from a base rule can be applied to characters, i.e. that there is no Token rule,
+    which requires a lexer. The rules of aliases which are not loaded yet are not checked.
+    :param base_rule: The rule to start from.
+    """
+    for rule in _loaded_rules(base_rule):
+        if isinstance(rule, Token):
+            raise RuleNotApplicableToTokensException('{} requires a lexer'.format(rule))
+
+def _loaded_rules(base_rule):
+    visited = set()
+    stack = [base_rule]
+    while stack:
+        rule = stack.pop()
+        if rule is None or rule in visited:
+            continue
+        visited.add(rule)
+        yield rule
+        if isinstance(rule, RuleCollection):
+            stack.extend(rule.rules)
+        elif isinstance(rule, RuleAlias):
+            # the rule property would load the rule of a lazy alias
+            stack.append(rule._rule)
+        elif isinstance(rule, RuleWrapper):
+            stack.append(rule.rule)
+
+
+class TokenStream:
+    """
+    Tokens of a string, stored as parallel arrays of kind ids, start positions and end positions.
+    Rules parse a token stream like a string, positions are token indices.
+    Only Token and Any rules consume tokens, and empty strings match without consuming anything.
+    Slicing a token stream returns the text covered by the tokens, so `match_string` of the results works as usual.
+    """
+
+    def __init__(self, string, kind_names):
+        self.string = string
+        self.kind_names = kind_names
+        self.kinds = array('i')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.hash = hash(string)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return isinstance(other, TokenStream) and self.string == other.string and self.kinds == other.kinds \
+            and self.starts == other.starts
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+            if start >= stop:
+                return ''
+            return self.string[self.starts[start]:self.ends[stop - 1]]
+        return self.kind_names[self.kinds[index]], self.starts[index], self.ends[index]
+
+    def kind(self, index):
+        return self.kind_names[self.kinds[index]]
+
+    def offset(self, index):
+        """
+        Maps a token index to a position within the string.
+        :param index: The token index.
+        :return: The start position of the token or the length of the string after the last token.
+        """
+        if index < len(self):
+            return self.starts[index]
+        return len(self.string)
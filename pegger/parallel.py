@@ -0,0 +1,227 @@
+import multiprocessing
+import os
+import re
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+
+from .results import ParsingSuccess, HIDDEN
+from .rules import ZeroOrMore, add_child
+
+# rule and string of the worker processes, set by _init_worker
+_worker_state = {}
+
+
+def parse_records(rule, string, resync, processes=None, chunks=None, lexer=None):
+    """
+    Parses a sequence of records in parallel, with the same result as `ZeroOrMore(rule).parse(string)`.
+    The string is split into chunks at matches of the resynchronization pattern and the records of every chunk
+    are parsed in a separate process. A chunk continues parsing beyond its end until a record ends there,
+    and where a record fails within the chunk it continues at the next match of the resynchronization pattern.
+    The records are then joined from the start of the string, where a split point turns out not to be a record boundary,
+    the records are parsed again until they align with the records of the chunk.
+    :param rule: The rule of a single record.
+    :param string: The string to parse.
+    :param resync: Regular expression whose matches end where a record probably starts, e.g. `\\n(?=ID)`.
+    :param processes: Number of processes, defaults to the number of CPUs.
+    :param chunks: Number of chunks, defaults to the number of processes.
+    :param lexer: Optional Lexer object, the string is then tokenized before it is split.
+    :return: The AST, the nodes of the records parsed by other processes are created when they are first accessed.
+    """
+    if isinstance(resync, str):
+        resync = re.compile(resync)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if chunks is None:
+        chunks = processes
+
+    boundaries = [0]
+    for i in range(1, chunks):
+        match = resync.search(string, max(len(string) * i // chunks, boundaries[-1] + 1))
+        if match is None:
+            break
+        if boundaries[-1] < match.end() < len(string):
+            boundaries.append(match.end())
+    boundaries.append(len(string))
+
+    if lexer is not None:
+        string = lexer.tokenize(string)
+        boundaries = [bisect_left(string.starts, boundary) for boundary in boundaries[:-1]] + [len(string)]
+    bounds = list(zip(boundaries, boundaries[1:]))
+
+    if processes == 1 or len(bounds) == 1:
+        return ZeroOrMore(rule).parse(string)
+    # forked processes inherit the rules instead of pickling them, which fails for lambda actions
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(min(processes, len(bounds)), _init_worker, (rule, string, resync)) as pool:
+        chunk_results = pool.map(_parse_chunk, bounds)
+
+    records = {}
+    stops = set()
+    for chunk, stop_positions in chunk_results:
+        for i in range(len(chunk.record_modes)):
+            records[chunk.starts[chunk.record_offsets[i]]] = chunk, i
+        stops.update(stop_positions)
+
+    pos = 0
+    children = _RecordList(string)
+    while pos not in stops or pos in records:
+        if pos in records:
+            chunk, i = records[pos]
+            # the modes are compared by value, since they are unpickled from the worker processes
+            if chunk.record_modes[i] is None:
+                children.append_encoded(chunk, i)
+            elif chunk.record_modes[i] == HIDDEN:
+                children.extend(chunk.decode(i, string).children)
+            pos = chunk.ends[chunk.record_offsets[i]]
+        else:
+            # the chunk started within a record, so the records are parsed again from the actual boundary
+            record = rule.parse(string, pos)
+            if not record or record.end_pos == pos:
+                break
+            add_child(children, record)
+            pos = record.end_pos
+    return ParsingSuccess(string, ZeroOrMore, 0, pos, children)
+
+def _init_worker(rule, string, resync):
+    _worker_state['rule'] = rule
+    _worker_state['string'] = string
+    _worker_state['resync'] = resync
+
+def _parse_chunk(bounds):
+    """
+    Parses the records of a chunk within a worker process.
+    :param bounds: Start and end position of the chunk.
+    :return: The encoded records and the positions where a record failed.
+    """
+    rule = _worker_state['rule']
+    string = _worker_state['string']
+    start_pos, end_pos = bounds
+    records = []
+    stop_positions = []
+    pos = start_pos
+    while pos < end_pos:
+        record = rule.parse(string, pos)
+        if not record or record.end_pos == pos:
+            # the chunk probably started within a record, so parsing continues where the next record probably starts
+            stop_positions.append(pos)
+            pos = _next_record_pos(string, _worker_state['resync'], pos)
+            continue
+        records.append(record)
+        pos = record.end_pos
+    return _EncodedRecords(records), stop_positions
+
+def _next_record_pos(string, resync, pos):
+    """
+    Finds the next match of the resynchronization pattern after a position.
+    :param string: The parsed string or token stream.
+    :param resync: The compiled resynchronization pattern.
+    :param pos: The position.
+    :return: The end of the match or the length of the string if there is none.
+    """
+    # the pattern is applied to the text of a token stream
+    text = getattr(string, 'string', string)
+    offset = string.offset(pos) if hasattr(string, 'offset') else pos
+    match = resync.search(text, offset + 1)
+    if match is None:
+        return len(string)
+    if hasattr(string, 'offset'):
+        return bisect_left(string.starts, match.end())
+    return match.end()
+
+
+class _EncodedRecords:
+    """
+    Records of a chunk, flattened into arrays in pre-order,
+    since pickling them as ParsingSuccess objects costs more than parsing them.
+    The string is not included, it is set again when the records are decoded.
+    """
+
+    def __init__(self, records):
+        self.rule_types = []
+        rule_type_ids = {}
+        self.rule_type_ids = array('i')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.child_counts = array('q')
+        self.values = []
+        self.names = []
+        self.record_offsets = array('q')
+        self.record_modes = []
+        for record in records:
+            self.record_offsets.append(len(self.starts))
+            self.record_modes.append(record.mode)
+            stack = [record]
+            while stack:
+                node = stack.pop()
+                if node.rule_type not in rule_type_ids:
+                    rule_type_ids[node.rule_type] = len(self.rule_types)
+                    self.rule_types.append(node.rule_type)
+                self.rule_type_ids.append(rule_type_ids[node.rule_type])
+                self.starts.append(node.start_pos)
+                self.ends.append(node.end_pos)
+                self.child_counts.append(len(node.children))
+                self.values.append(node.value)
+                self.names.append(node.name)
+                stack.extend(reversed(node.children))
+
+    def decode(self, i, string):
+        """
+        Creates the ParsingSuccess objects of a record, without the mode of the record.
+        :param i: The index of the record.
+        :param string: The parsed string.
+        :return: The ParsingSuccess object of the record.
+        """
+        offset = self.record_offsets[i]
+        record = None
+        # nodes whose children are not complete yet, together with the number of missing children
+        stack = []
+        for index in range(offset, self.record_offsets[i + 1] if i + 1 < len(self.record_offsets) else len(self.starts)):
+            node = ParsingSuccess(string, self.rule_types[self.rule_type_ids[index]], self.starts[index], self.ends[index], [], self.values[index])
+            node.name = self.names[index]
+            if stack:
+                stack[-1][0].children.append(node)
+                stack[-1][1] -= 1
+            else:
+                record = node
+            if self.child_counts[index]:
+                stack.append([node, self.child_counts[index]])
+            while stack and not stack[-1][1]:
+                stack.pop()
+        return record
+
+
+class _RecordList(Sequence):
+    """
+    Children of the result of a parallel parse, which creates the nodes of the encoded records on first access.
+    Hence the main process does not create the nodes of every record before the result is returned.
+    """
+
+    def __init__(self, string):
+        self.string = string
+        # ParsingSuccess objects and (encoded records, index) pairs
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = self.items[index]
+        if isinstance(item, tuple):
+            chunk, i = item
+            item = self.items[index] = chunk.decode(i, self.string)
+        return item
+
+    def append(self, record):
+        self.items.append(record)
+
+    def extend(self, records):
+        self.items.extend(records)
+
+    def append_encoded(self, chunk, i):
+        self.items.append((chunk, i))
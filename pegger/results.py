@@ -1,11 +1,93 @@
+from .columns import ParseTreeColumns
+
+# Node modes, see Rule.hide, Rule.as_token and Rule.drop
+HIDDEN = 'hidden'
+TOKEN = 'token'
+DROPPED = 'dropped'
+
+
 class ParsingSuccess:
-    def __init__(self, string, rule_type, start_pos, end_pos, children):
+    mode = None
+    # name of the innermost named alias that returned the node, see RuleAlias
+    name = None
+
+    def __init__(self, string, rule_type, start_pos, end_pos, children, value=None):
         self.string = string
         self.rule_type = rule_type
         self.start_pos = start_pos
         self.end_pos = end_pos
         self.children = children
+        self.value = value
 
     @property
     def match_string(self):
         return self.string[self.start_pos:self.end_pos]
+
+    @property
+    def values(self):
+        return [child.value for child in self.children]
+
+    def to_columns(self):
+        """
+        Flattens the tree into parallel arrays, see ParseTreeColumns.
+        :return: The ParseTreeColumns object.
+        """
+        return ParseTreeColumns.from_tree(self)
+
+
+class ParsingFailure:
+    """
+    Describes why a string could not be parsed.
+    It is filled while parsing with the furthest position where a terminal rule failed
+    and the set of terminal rules that were expected at this position.
+    Failures within lookahead rules are not recorded, except for the lookahead rule itself.
+    """
+
+    def __init__(self, string):
+        self.string = string
+        self.pos = 0
+        self.expected_rules = set()
+        self.predicate_depth = 0
+
+    def __bool__(self):
+        return False
+
+    def __str__(self):
+        return 'line {}, column {}: expected {}'.format(self.line, self.column, ', '.join(self.expected) or 'nothing')
+
+    def record(self, pos, rule):
+        """
+        Records a failed terminal rule.
+        :param pos: The position where the rule failed.
+        :param rule: The failed rule.
+        """
+        if self.predicate_depth:
+            return
+        if pos > self.pos:
+            self.pos = pos
+            self.expected_rules = {rule}
+        elif pos == self.pos:
+            self.expected_rules.add(rule)
+
+    @property
+    def expected(self):
+        return sorted(set(str(rule) for rule in self.expected_rules))
+
+    @property
+    def text(self):
+        # the parsed string might be the token stream of a lexer
+        return getattr(self.string, 'string', self.string)
+
+    @property
+    def offset(self):
+        if hasattr(self.string, 'offset'):
+            return self.string.offset(self.pos)
+        return self.pos
+
+    @property
+    def line(self):
+        return self.text.count('\n', 0, self.offset) + 1
+
+    @property
+    def column(self):
+        return self.offset - self.text.rfind('\n', 0, self.offset)
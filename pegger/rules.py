@@ -1,4 +1,10 @@
-from .results import ParsingSuccess
+from reprlib import recursive_repr
+
+from .results import ParsingSuccess, HIDDEN, TOKEN, DROPPED
+
+# number of token and dropped rules being parsed, whose descendants only recognize their spans,
+# not an attribute of Rule, since assigning class attributes slows down the attribute lookups of all rules
+_recognizing = 0
 
 
 class Rule:
@@ -7,8 +13,16 @@ class Rule:
     This class should not be used directly to generate a grammar.
     """
 
+    # ParsingFailure object which records failing terminal rules, set by Grammar.parse
+    failure_tracker = None
+
     def __init__(self):
         self.memoization_dict = {}
+        # results memoized by the latest parse with a failure tracker, which recorded their failures
+        self.tracked_memoization_dict = {}
+        self.tracked_failure_tracker = None
+        self.action = None
+        self.mode = None
 
     def parse(self, string, start_pos = 0):
         """
@@ -17,11 +31,102 @@ class Rule:
         :param start_pos: Starting position within the string.
         :return: The AST.
         """
+        global _recognizing
         key = (hash(string), start_pos)
+        tracker = Rule.failure_tracker
+
+        if tracker is None:
+            memoization_dict = self.memoization_dict
+        else:
+            # the failures of results memoized by other parses were not recorded, so they are not reused
+            if self.tracked_failure_tracker is not tracker:
+                self.tracked_failure_tracker = tracker
+                self.tracked_memoization_dict = {}
+            memoization_dict = self.tracked_memoization_dict
+            if tracker.predicate_depth:
+                # neither are the failures within lookahead rules
+                key += (None,)
+        if _recognizing:
+            # results without children are kept apart, since they cannot be reused outside of tokens
+            key += (TOKEN,)
+
+        if key in memoization_dict:
+            return memoization_dict[key]
+        if self.mode is not None and self._recognizes():
+            _recognizing += 1
+            try:
+                result = self._parse(string, start_pos)
+            finally:
+                _recognizing -= 1
+        else:
+            result = self._parse(string, start_pos)
+        if result and (self.action is not None or self.mode is not None) and not _recognizing:
+            result = self._reduce(string, result)
+        return memoization_dict.setdefault(key, result)
+
+    def _recognizes(self):
+        """
+        Whether the descendants of the rule only recognize their spans, since the children would be discarded.
+        :return: True for token and dropped rules without an action.
+        """
+        return self.action is None and (self.mode is TOKEN or self.mode is DROPPED)
+
+    def _reduce(self, string, result):
+        """
+        Applies the semantic action and the node mode of the rule to a successful result.
+        The result is modified in place, it has to be created by the rule itself.
+        :param string: The parsed string.
+        :param result: The ParsingSuccess object returned by _parse.
+        :return: The ParsingSuccess object.
+        """
+        if self.action is not None:
+            # the subtree is replaced by the computed value, so it can be freed as soon as possible
+            result.value = self.action(result)
+            result.children = []
+        elif self.mode is TOKEN or self.mode is DROPPED:
+            result.children = []
+        # a node with a value but without children is not hidden, since splicing it would lose the value
+        if self.mode is DROPPED or self.mode is HIDDEN and (result.children or result.value is None):
+            result.mode = self.mode
+        return result
+
+    def set_action(self, action):
+        """
+        Sets a semantic action which is executed every time the rule succeeds.
+        The action is called with the resulting node, whose children already carry the values of their own actions.
+        Its return value is stored as the value of the node and the children are discarded.
+        Since results are memoized the action is executed at most once per position and never within a token or dropped node,
+        but it may be executed for alternatives that are discarded afterwards, so it should be free of side effects.
+        :param action: A callable taking a ParsingSuccess object.
+        :return: The rule itself.
+        """
+        self.action = action
+        return self
+
+    def hide(self):
+        """
+        Hides the nodes of the rule, their children are spliced into the parent node.
+        Nodes with the value of an action have no children and are kept.
+        :return: The rule itself.
+        """
+        self.mode = HIDDEN
+        return self
+
+    def as_token(self):
+        """
+        Keeps only the span of the nodes of the rule, their children are not built.
+        :return: The rule itself.
+        """
+        self.mode = TOKEN
+        return self
 
-        if key in self.memoization_dict:
-            return self.memoization_dict[key]
-        return self.memoization_dict.setdefault(key, self._parse(string, start_pos))
+    def drop(self):
+        """
+        Drops the nodes of the rule, they still consume input but are not added to the parent node.
+        :return: The rule itself.
+        """
+        self.mode = DROPPED
+        return self
 
     def _parse(self, string, start_pos):
         """
@@ -32,6 +137,16 @@ class Rule:
         """
         raise NotImplementedError
 
+    def _fail(self, start_pos):
+        """
+        Records the failure of the rule at the current failure tracker.
+        :param start_pos: Starting position whithin the string.
+        :return: False.
+        """
+        if Rule.failure_tracker is not None:
+            Rule.failure_tracker.record(start_pos, self)
+        return False
+
     @staticmethod
     def cast_rule(rule):
         """
@@ -44,6 +159,24 @@ class Rule:
         return String(rule) if isinstance(rule, str) else rule
 
 
+def _escape(string):
+    return string.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
+
+
+def add_child(children, rule_result):
+    """
+    Adds the result of a subrule to a list of children with respect to its node mode.
+    :param children: The list of children.
+    :param rule_result: The ParsingSuccess object of the subrule.
+    """
+    if _recognizing:
+        return
+    if rule_result.mode is None:
+        children.append(rule_result)
+    elif rule_result.mode is HIDDEN:
+        children.extend(rule_result.children)
+
+
 class AliasHasNoRuleException(Exception):
     pass
 
@@ -52,6 +185,7 @@ class RuleAlias(Rule):
     """
     Alias for a rule. Contains a rule name and contain the rule that it aliases.
     Note: It is possible but strictly not recommended to have multiple aliases with the same name.
+    An alias without a name can be used to set an action or a node mode without changing the aliased rule.
     """
 
     def __init__(self, name, rule=None):
@@ -70,10 +204,27 @@ class RuleAlias(Rule):
     def rule(self, rule):
         self._rule = self.cast_rule(rule)
 
+    def __str__(self):
+        if self.name is None:
+            return str(self.rule)
+        return '<{}>'.format(self.name)
+
     def _parse(self, string, start_pos):
         if self.rule is None:
-            raise self.AliasHasNoRuleException()
-        return self.rule.parse(string, start_pos)
+            raise AliasHasNoRuleException(self.name)
+        rule_result = self.rule.parse(string, start_pos)
+        # within a token the result is not reduced, unless the alias is the token itself
+        if not rule_result or _recognizing > self._recognizes():
+            return rule_result
+        reduced = self.action is not None or self.mode is not None
+        if reduced or self.name is not None and rule_result.name is None:
+            # the result is memoized and shared by the aliased rule, so it is copied before it is changed
+            alias_result = ParsingSuccess(string, rule_result.rule_type, rule_result.start_pos, rule_result.end_pos, rule_result.children, rule_result.value)
+            alias_result.name = self.name if rule_result.name is None else rule_result.name
+            if not reduced:
+                alias_result.mode = rule_result.mode
+            rule_result = alias_result
+        return rule_result
 
 
 class RuleCollection(Rule):
@@ -131,10 +282,13 @@ class String(Rule):
         super().__init__()
         self.s = s
 
+    def __str__(self):
+        return '"{}"'.format(_escape(self.s))
+
     def _parse(self, string, start_pos):
         if string[start_pos:start_pos + len(self.s)] == self.s:
             return ParsingSuccess(string, self.__class__, start_pos, start_pos + len(self.s), [])
-        return False
+        return self._fail(start_pos)
 
 
 class Range(Rule):
@@ -152,11 +306,16 @@ class Range(Rule):
         self.start_symbol_ord = ord(start_symbol)
         self.end_symbol_ord = ord(end_symbol)
 
+    def __str__(self):
+        if self.start_symbol_ord == self.end_symbol_ord:
+            return '[{}]'.format(_escape(chr(self.start_symbol_ord)))
+        return '[{}-{}]'.format(_escape(chr(self.start_symbol_ord)), _escape(chr(self.end_symbol_ord)))
+
     def _parse(self, string, start_pos):
         char = string[start_pos:start_pos + 1]
         if len(char) and self.start_symbol_ord <= ord(char) <= self.end_symbol_ord:
             return ParsingSuccess(string, self.__class__, start_pos, start_pos + 1, [])
-        return False
+        return self._fail(start_pos)
 
 
 class Any(Rule):
@@ -164,10 +323,33 @@ class Any(Rule):
     Rule that matches any symbol, e.g. `.`.
     """
 
+    def __str__(self):
+        return '.'
+
     def _parse(self, string, start_pos):
         if start_pos < len(string):
             return ParsingSuccess(string, self.__class__, start_pos, start_pos + 1, [])
-        return False
+        return self._fail(start_pos)
+
+
+class Token(Rule):
+    """
+    Rule matching a single token of a kind, e.g. `@Number`.
+    Only applicable to the token streams of a Lexer.
+    """
+
+    def __init__(self, kind):
+        assert type(kind) == str
+        super().__init__()
+        self.kind = kind
+
+    def __str__(self):
+        return '@{}'.format(self.kind)
+
+    def _parse(self, tokens, start_pos):
+        if start_pos < len(tokens) and tokens.kind_names[tokens.kinds[start_pos]] == self.kind:
+            return ParsingSuccess(tokens, self.__class__, start_pos, start_pos + 1, [])
+        return self._fail(start_pos)
 
 
 class Choices(RuleCollection):
@@ -175,11 +357,17 @@ class Choices(RuleCollection):
     Prioritized choice rule, e.g. `(A | B | C)`.
     """
 
+    @recursive_repr('...')
+    def __str__(self):
+        return '({})'.format(' / '.join(str(rule) for rule in self.rules))
+
     def _parse(self, string, start_pos):
         for rule in self.rules:
             rule_result = rule.parse(string, start_pos)
             if rule_result:
-                return ParsingSuccess(string, self.__class__, start_pos, rule_result.end_pos, [rule_result])
+                children = []
+                add_child(children, rule_result)
+                return ParsingSuccess(string, self.__class__, start_pos, rule_result.end_pos, children, rule_result.value)
         return False
 
 
@@ -188,13 +376,17 @@ class Sequence(RuleCollection):
     Sequence of rules, e.g. `A B C`.
     """
 
+    @recursive_repr('...')
+    def __str__(self):
+        return '({})'.format(' '.join(str(rule) for rule in self.rules))
+
     def _parse(self, string, start_pos):
         pos = start_pos
         children = []
         for rule in self.rules:
             rule_result = rule.parse(string, pos)
             if rule_result:
-                children.append(rule_result)
+                add_child(children, rule_result)
                 pos = rule_result.end_pos
                 continue
             return False
@@ -206,11 +398,20 @@ class And(RuleWrapper):
     And (lookahead) rule that allows to check the string without consuming it, e.g. `&A`.
     """
 
+    @recursive_repr('...')
+    def __str__(self):
+        return '&{}'.format(self.rule)
+
     def _parse(self, string, start_pos):
+        tracker = Rule.failure_tracker
+        if tracker is not None:
+            tracker.predicate_depth += 1
         rule_result = self.rule.parse(string, start_pos)
+        if tracker is not None:
+            tracker.predicate_depth -= 1
         if rule_result:
             return ParsingSuccess(string, self.__class__, start_pos, start_pos, [])
-        return False
+        return self._fail(start_pos)
 
 
 class Not(RuleWrapper):
@@ -218,9 +419,19 @@ class Not(RuleWrapper):
     Not rule that checks the string if a rule is not applicable, e.g. `!A`.
     """
 
+    @recursive_repr('...')
+    def __str__(self):
+        return '!{}'.format(self.rule)
+
     def _parse(self, string, start_pos):
-        if self.rule.parse(string, start_pos):
-            return False
+        tracker = Rule.failure_tracker
+        if tracker is not None:
+            tracker.predicate_depth += 1
+        rule_result = self.rule.parse(string, start_pos)
+        if tracker is not None:
+            tracker.predicate_depth -= 1
+        if rule_result:
+            return self._fail(start_pos)
         return ParsingSuccess(string, self.__class__, start_pos, start_pos, [])
 
 
@@ -229,13 +440,17 @@ class ZeroOrMore(RuleWrapper):
     Zero or more rule, e.g. `A*`.
     """
 
+    @recursive_repr('...')
+    def __str__(self):
+        return '{}*'.format(self.rule)
+
     def _parse(self, string, start_pos):
         pos = start_pos
         children = []
         while True:
             rule_result = self.rule.parse(string, pos)
             if rule_result:
-                children.append(rule_result)
+                add_child(children, rule_result)
                 pos = rule_result.end_pos
                 continue
             break
@@ -248,17 +463,26 @@ class OneOrMore(RuleWrapper):
     One or more rule, e.g. `A+`.
     """
 
-    def __init__(self, rule):
-        super().__init__(rule)
-        self.zero_or_more_rule = ZeroOrMore(rule)
+    @RuleWrapper.rule.setter
+    def rule(self, rule):
+        self._rule = self.cast_rule(rule)
+        # kept in sync, since aliases of generated grammars are replaced after construction
+        self.zero_or_more_rule = ZeroOrMore(self._rule)
+
+    @recursive_repr('...')
+    def __str__(self):
+        return '{}+'.format(self.rule)
 
     def _parse(self, string, start_pos):
         rule_result = self.rule.parse(string, start_pos)
         if rule_result:
+            children = []
+            add_child(children, rule_result)
             zero_or_more_result = self.zero_or_more_rule.parse(string, rule_result.end_pos)
             if zero_or_more_result:
-                return ParsingSuccess(string, self.__class__, start_pos, zero_or_more_result.end_pos, [rule_result] + zero_or_more_result.children)
-            return ParsingSuccess(string, self.__class__, start_pos, rule_result.end_pos, [rule_result])
+                children.extend(zero_or_more_result.children)
+                return ParsingSuccess(string, self.__class__, start_pos, zero_or_more_result.end_pos, children)
+            return ParsingSuccess(string, self.__class__, start_pos, rule_result.end_pos, children)
         return False
 
 
@@ -267,8 +491,14 @@ class Optional(RuleWrapper):
     Optional rule, e.g. `A?`.
     """
 
+    @recursive_repr('...')
+    def __str__(self):
+        return '{}?'.format(self.rule)
+
     def _parse(self, string, start_pos):
         rule_result = self.rule.parse(string, start_pos)
         if rule_result:
-            return ParsingSuccess(string, self.__class__, start_pos, rule_result.end_pos, [rule_result])
+            children = []
+            add_child(children, rule_result)
+            return ParsingSuccess(string, self.__class__, start_pos, rule_result.end_pos, children)
         return ParsingSuccess(string, self.__class__, start_pos, start_pos, [])
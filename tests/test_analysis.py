@@ -0,0 +1,99 @@
+import pytest
+
+from pegger.analysis import reachable_rules, nullable_rules, first_sets, first_pattern, first_kinds, analyze, main, GrammarAnalysisException
+from pegger.grammar import Grammar
+from pegger.rules import *
+
+
+def test_nullable_rules():
+    A = Choices()
+    A.add_rules(Sequence('(', A, ')', A), '')
+    B = OneOrMore(Optional('b'))
+    C = Sequence(Not('c'), Range('a', 'z'))
+
+    rules = reachable_rules(Sequence(A, B, C))
+    nullable = nullable_rules(rules)
+    assert A in nullable
+    assert B in nullable
+    assert C not in nullable
+
+def test_first_sets():
+    A = Choices()
+    A.add_rules(Sequence(Optional('x'), 'y'), Sequence(A, 'z'), Range('0', '9'))
+    B = Sequence(And('q'), ZeroOrMore('r'), 's')
+
+    rules = reachable_rules(Choices(A, B))
+    first = first_sets(rules, nullable_rules(rules))
+    assert first[A] == {(ord('x'), ord('x')), (ord('y'), ord('y')), (ord('0'), ord('9'))}
+    assert first[B] == {(ord('r'), ord('r')), (ord('s'), ord('s'))}
+
+def test_first_pattern():
+    pattern = first_pattern(Choices(Sequence(Optional('-'), OneOrMore(Range('0', '9'))), Range('1', 'a')))
+    assert pattern.search('abc-1').start() == 0
+    assert pattern.search('bc-1').start() == 2
+    assert first_pattern(Sequence('a', Any())).search('ba').start() == 1
+    assert first_pattern(Sequence(Any(), 'a')) is None
+    assert first_pattern(Not('a')).search('abc') is None
+
+def test_first_kinds():
+    assert first_kinds(Sequence(Optional(Token('Sign')), Choices(Token('Number'), Token('Name')))) == {'Sign', 'Number', 'Name'}
+    assert first_kinds(Sequence(Any(), Token('Name'))) is None
+    assert first_kinds(Not(Token('Name'))) == set()
+
+def test_analyze():
+    A = RuleAlias('A')
+    B = RuleAlias('B')
+    A.rule = Choices(Sequence(B, 'a'), 'b')
+    B.rule = Sequence(Optional('c'), A)
+    issues = analyze(Sequence(A, ZeroOrMore(Optional('d'))))
+    assert [str(issue) for issue in issues] == [
+        'error: Sequence > ZeroOrMore[1]: repeats a rule that can succeed without consuming input, parsing loops forever',
+        'error: <A>: is left-recursive through <A>, <B>, parsing exceeds the recursion limit',
+        'warning: <A> > Choices: alternative 1 can start like a previous alternative, which causes backtracking',
+    ]
+
+    issues = analyze(Choices('a', Sequence('ab'), 'b', 'ab', Optional('c'), 'c', 'd'))
+    assert [str(issue) for issue in issues] == [
+        'warning: Choices > Sequence[1]: never succeeds, since alternative 0 matches a prefix of it',
+        'warning: Choices > String[3]: never succeeds, since alternative 0 matches a prefix of it',
+        'warning: Choices > String[5]: is never tried, since alternative 4 always succeeds',
+        'warning: Choices > String[6]: is never tried, since alternative 4 always succeeds',
+    ]
+
+    assert analyze(Choices(Token('a'), Token('b'), Token('a')))[0].message.startswith('alternative 2 can start')
+
+def test_check():
+    grammar = Grammar(OneOrMore(Choices('a', '')))
+    with pytest.raises(GrammarAnalysisException) as exception:
+        grammar.check()
+    assert exception.value.issues[0].path == 'OneOrMore'
+
+    assert Grammar(OneOrMore(Choices('a', 'b'))).check() == []
+
+def test_main(tmpdir, capsys):
+    path = tmpdir.join('grammar.peg')
+    path.write('<A> := <B>* {action}\n<B> := "b"?\n<C> := "c"')
+    assert main([str(path)]) == 1
+    assert capsys.readouterr().out.startswith('error: <A> > Choices > Sequence[0] > ZeroOrMore[0]: repeats')
+    assert main([str(path), '--start', 'C']) == 0
+    capsys.readouterr()
+
+    # unreachable definitions are analyzed too, the issues of shared rules once
+    path.write('<A> := <C> "a"\n<B> := <C> "b"\n<C> := ("c"?)*')
+    assert main([str(path)]) == 1
+    assert capsys.readouterr().out.splitlines() == \
+        ['error: <C> > Choices > Sequence[0] > ZeroOrMore[0]: repeats a rule that can succeed without consuming input, parsing loops forever']
+    path.write('<A> := "a"\n<B> := ("b"?)*')
+    assert main([str(path)]) == 1
+    assert capsys.readouterr().out.startswith('error: <B> > Choices > Sequence[0] > ZeroOrMore[0]: repeats')
+    assert main([str(path), '--start', 'A']) == 0
+
+    path.write('<A> := "a"\n<B> := "b" (')
+    assert main([str(path)]) == 1
+    assert capsys.readouterr().out == 'error: {}: definition is not parsable at <B>\n'.format(path)
+    path.write('<A> := <C>')
+    assert main([str(path)]) == 1
+    assert capsys.readouterr().out == 'error: {}: definition is not parsable at <C>\n'.format(path)
+
+    path.write('<A> := @Name (@Operator @Name)*')
+    assert main([str(path), '--lexer', 'tests.test_lexer:lexer']) == 0
@@ -0,0 +1,56 @@
+import pytest
+
+from pegger.columns import ParseTreeColumns
+from pegger.grammar import Grammar
+from pegger.grammar_parser import generate_grammar
+from pegger.rules import *
+
+
+def test_columns():
+    item = Choices(OneOrMore(Range('a', 'z')).as_token(), Sequence('(', ZeroOrMore(Range('a', 'z')), ')'))
+    grammar = Grammar(ZeroOrMore(item))
+
+    columns = grammar.parse_columns('ab(c)')
+    assert len(columns) == 9
+    assert columns.rule_names == ['ZeroOrMore', 'Choices', 'OneOrMore', 'Sequence', 'String', 'Range']
+    assert list(columns.rule_ids) == [0, 1, 2, 1, 3, 4, 0, 5, 4]
+    assert list(columns.starts) == [0, 0, 0, 2, 2, 2, 3, 3, 4]
+    assert list(columns.ends) == [5, 2, 2, 5, 5, 3, 4, 4, 5]
+    assert list(columns.parents) == [-1, 0, 1, 0, 3, 4, 4, 6, 4]
+    assert list(columns.depths) == [0, 1, 2, 1, 2, 3, 3, 4, 3]
+
+    failure = Grammar(Sequence(item, Not(Any()))).parse_columns('ab(')
+    assert not failure
+    assert failure.pos == 2
+
+def test_rule_names():
+    grammar = generate_grammar('<Call> := <Name> "(" <Name> ")"\n'
+                               '<Name> := [a-z]+')
+
+    columns = grammar.parse_columns('f(x)')
+    assert columns.rule_names == ['<Call>', 'Sequence', '<Name>', 'OneOrMore', 'Choices', 'Range', 'String']
+    assert [columns.rule_names[rule_id] for rule_id in columns.rule_ids] == \
+           ['<Call>', 'Sequence', '<Name>', 'Sequence', 'OneOrMore', 'Choices', 'Range', 'String', '<Name>', 'Sequence', 'OneOrMore', 'Choices', 'Range', 'String']
+
+    letters = OneOrMore(Range('a', 'z'))
+    alias = RuleAlias('X', letters)
+    assert Grammar(Choices(Sequence(alias, '!'), letters)).parse_columns('ab').rule_names[:3] == ['Choices', 'OneOrMore', 'Range']
+    assert Grammar(Choices(letters)).parse_columns('ab').rule_names[:3] == ['Choices', 'OneOrMore', 'Range']
+    assert Grammar(Choices(Sequence(alias, '!'), letters)).parse_columns('ab!').rule_names[:3] == ['Choices', 'Sequence', '<X>']
+
+def test_save_and_load(tmpdir):
+    grammar = Grammar(Sequence(OneOrMore(Choices('a', 'b')), Optional('c')))
+    columns = grammar.parse('abbac').to_columns()
+
+    path = str(tmpdir.join('tree.pegc'))
+    columns.save(path)
+    loaded = ParseTreeColumns.load(path)
+
+    assert loaded.rule_names == columns.rule_names
+    for name in ParseTreeColumns.COLUMNS:
+        assert list(getattr(loaded, name)) == list(getattr(columns, name))
+
+    with open(path, 'r+b') as file:
+        file.write(b'XXXX')
+    with pytest.raises(ValueError):
+        ParseTreeColumns.load(path)
@@ -1,6 +1,7 @@
 import pytest
 
 from pegger import grammar_parser
+from pegger.analysis import GrammarAnalysisException
 
 
 def test_end_of_file():
@@ -188,3 +189,101 @@ def test_generate_grammar():
     grammar = grammar_parser.generate_grammar(string)
     assert grammar.match_whole('(())()(((()))())(())')
     assert not grammar.match_whole('(())()((((()))())(())')
+
+def test_action():
+    string = '{int} <A>'
+    assert grammar_parser._action(string, 0) == ('int', 6)
+    assert not grammar_parser._action(string, 6)
+    assert not grammar_parser._action('{1int}', 0)
+
+def test_generate_grammar_actions():
+    string = '<Sum> := <Number> <Tail>* {sum}\n' \
+             '<Tail> := "+" <Number> {second}\n' \
+             '<Number> := [0-9]+ {int}'
+    actions = {
+        'sum': lambda node: node.values[0] + sum(node.children[1].values),
+        'second': lambda node: node.values[1],
+        'int': lambda node: int(node.match_string),
+    }
+    grammar = grammar_parser.generate_grammar(string, actions)
+    assert grammar.parse('1+20+300').value == 321
+
+    with pytest.raises(grammar_parser.ActionNotDefinedException):
+        grammar_parser.generate_grammar('<A> := "a" {undefined}')
+
+    # grammars generated from the same definition do not share their rules
+    string = '<Number> := [0-9]+ {int}'
+    grammar_1 = grammar_parser.generate_grammar(string, {'int': lambda node: int(node.match_string)})
+    assert grammar_1.parse('42').value == 42
+    grammar_2 = grammar_parser.generate_grammar(string, {'int': lambda node: -1})
+    assert grammar_2.parse('42').value == -1
+    assert grammar_1.parse('8').value == 8
+
+def test_node_mode_prefixes():
+    string = '~<A> $"b" -[c] <D>'
+    assert grammar_parser._prefix(string, 0)[0].mode == 'hidden'
+    assert grammar_parser._prefix(string, 5)[0].mode == 'token'
+    assert grammar_parser._prefix(string, 10)[0].mode == 'dropped'
+    assert grammar_parser._prefix(string, 15)[0].mode is None
+
+    string = '<List> := -"(" $<Item> (-"," ~<Item>)* -")"\n' \
+             '<Item> := [a-z]+'
+    grammar = grammar_parser.generate_grammar(string)
+    result = grammar.parse('(ab,c)')
+    sequence = result.children[0]
+    assert [child.match_string for child in sequence.children] == ['ab', ',c']
+    assert sequence.children[0].children == []
+
+def test_locate_definitions():
+    string = '# comment\n<A> := "a:=" [<] <B>\n' \
+             '<B>\n := \'>\' / {b} <A>'
+    assert grammar_parser._locate_definitions(string, {'b': None}) == [['A', 17, 31], ['B', 39, len(string)]]
+
+    with pytest.raises(grammar_parser.GrammarDefinitionNotParsableException):
+        grammar_parser._locate_definitions('"a" <A> := "a"', {})
+    with pytest.raises(grammar_parser.GrammarDefinitionNotParsableException):
+        grammar_parser._locate_definitions('<A> := "a" ;', {})
+    with pytest.raises(grammar_parser.ActionNotDefinedException):
+        grammar_parser._locate_definitions('<A> := "a" {b}', {})
+    with pytest.raises(grammar_parser.GrammarDefinitionNotParsableException) as exception:
+        grammar_parser._locate_definitions('<A> := <Nope>', {})
+    assert exception.value.args == ('Nope',)
+
+def test_generate_grammar_lazy():
+    string = '<A> := "a" <B>?\n' \
+             '<B> := "b" <A>?\n' \
+             '<C> := "c" <D>\n' \
+             '<D> := "d" (\n' \
+             '<E> := "e" <A>'
+    grammar = grammar_parser.generate_grammar(string)
+    assert grammar.match_whole('abab')
+    assert grammar.aliases['C']._rule is None
+    assert grammar.aliases['E']._rule is None
+
+    assert grammar.select('E').match_whole('eaba')
+    assert grammar_parser.generate_grammar(string, start='B').match_whole('bab')
+
+    with pytest.raises(grammar_parser.GrammarDefinitionNotParsableException):
+        grammar.select('C').parse('cd')
+
+    # every grammar loads its own rules, which reference its own aliases
+    grammar_1 = grammar_parser.generate_grammar(string)
+    grammar_2 = grammar_parser.generate_grammar(string)
+    assert grammar_1.match_whole('abab') and grammar_2.match_whole('abab')
+    assert grammar_1.aliases['A'].rule is not grammar_2.aliases['A'].rule
+    assert grammar_1.aliases['A'].rule.rules[0].rules[1].rule is grammar_1.aliases['B']
+
+def test_token():
+    string = '@Number @_name1 @ @1'
+    assert grammar_parser._token(string, 0)[0].kind == 'Number'
+    assert grammar_parser._token(string, 0)[1] == 8
+    assert grammar_parser._token(string, 8)[1] == 16
+    assert not grammar_parser._token(string, 16)
+    assert not grammar_parser._token(string, 18)
+    assert grammar_parser._primary(string, 8)[1] == 16
+
+def test_generate_grammar_check():
+    string = '<A> := <B>*\n<B> := "b" / ""'
+    assert grammar_parser.generate_grammar(string, start='B', check=True)
+    with pytest.raises(GrammarAnalysisException):
+        grammar_parser.generate_grammar(string, check=True)
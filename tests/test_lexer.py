@@ -0,0 +1,92 @@
+import pytest
+
+from pegger.grammar import Grammar
+from pegger.grammar_parser import generate_grammar
+from pegger.lexer import Lexer, NotTokenizableException, TokenKindNotDefinedException, RuleNotApplicableToTokensException, TokenPatternNotValidException
+from pegger.rules import *
+
+
+lexer = Lexer([
+    ('Number', r'[0-9]+(\.[0-9]+)?'),
+    ('Name', r'[a-z]+'),
+    ('Operator', r'[+*]'),
+    ('Space', r'\s+|#[^\n]*'),
+], skip=['Space'])
+
+def test_tokenize():
+    tokens = lexer.tokenize('a + 1.5 # comment\n*b2')
+    assert len(tokens) == 6
+    assert [tokens.kind(i) for i in range(len(tokens))] == ['Name', 'Operator', 'Number', 'Operator', 'Name', 'Number']
+    assert tokens[2] == ('Number', 4, 7)
+    assert tokens[1:4] == '+ 1.5 # comment\n*'
+    assert tokens.offset(6) == 21
+
+    with pytest.raises(NotTokenizableException) as exception:
+        lexer.tokenize('a - b')
+    assert exception.value.pos == 2
+
+def test_token_patterns():
+    with pytest.raises(TokenPatternNotValidException) as exception:
+        Lexer([('Name', r'[a-z]+'), ('Space', r'\s*')])
+    assert exception.value.kind == 'Space'
+    with pytest.raises(TokenPatternNotValidException) as exception:
+        Lexer([('Number', r'(?P<digits>[0-9]+)'), ('Name', r'(?P<digits>[a-z]+)')])
+    assert str(exception.value) == 'Name: group name digits is already used by Number'
+    with pytest.raises(TokenPatternNotValidException):
+        Lexer([('Name', r'[a-z')])
+
+    tokens = Lexer([('Name', r'[a-z]+'), ('Space', r'\s+')], skip=['Space']).tokenize('a b')
+    assert [tokens.kind(i) for i in range(len(tokens))] == ['Name', 'Name']
+
+def test_grammar_with_lexer():
+    value = Choices(Token('Number'), Token('Name'))
+    grammar = Grammar(Sequence(value, ZeroOrMore(Sequence(Token('Operator'), value))), lexer=lexer)
+
+    result = grammar.parse('a + 1.5\n*b')
+    assert result.end_pos == 5
+    assert result.match_string == 'a + 1.5\n*b'
+    assert grammar.match_whole('12 * 3 + x')
+    assert not grammar.match_whole('12 * 3 +')
+
+    grammar = Grammar(Sequence(grammar.base_rule, Not(Any())), lexer=lexer)
+    failure = grammar.parse('1 +\n+ 2')
+    assert (failure.line, failure.column) == (2, 1)
+    assert failure.expected == ['@Name', '@Number']
+
+    failure = grammar.parse('1 - 2')
+    assert failure.pos == 2
+    assert failure.expected == ['@Name', '@Number', '@Operator']
+
+    assert [match.match_string for match in Grammar(Token('Number'), lexer=lexer).finditer('a 1 b 2.5')] == ['1', '2.5']
+
+def test_segments():
+    segments = list(lexer.segments('-a 1- -;2'))
+    assert [(tokens.starts[0], len(tokens)) for tokens in segments] == [(1, 2), (8, 1)]
+    assert segments[0] != lexer.tokenize('a 1')
+
+    sum_rule = Sequence(Token('Number'), ZeroOrMore(Sequence(Token('Operator'), Token('Number'))))
+    matches = Grammar(sum_rule, lexer=lexer).finditer('1 + 2 - 3 + 4 ; 5 * 6 *')
+    assert [match.match_string for match in matches] == ['1 + 2', '3 + 4', '5 * 6']
+
+def test_check_rules():
+    with pytest.raises(RuleNotApplicableToTokensException):
+        Grammar(Sequence(Token('Name'), Range('a', 'z')), lexer=lexer)
+    with pytest.raises(RuleNotApplicableToTokensException):
+        Grammar(Choices(Token('Name'), ZeroOrMore('+')), lexer=lexer)
+    with pytest.raises(TokenKindNotDefinedException):
+        Grammar(Optional(Token('Nmae')), lexer=lexer)
+    with pytest.raises(TokenKindNotDefinedException):
+        Grammar(Token('Space'), lexer=lexer)
+    assert Grammar(Sequence(Token('Name'), '', Not(Any())), lexer=lexer).match_whole('a')
+
+    with pytest.raises(TokenKindNotDefinedException):
+        generate_grammar('<A> := @Name <B>\n<B> := @Nmae', lexer=lexer)
+    with pytest.raises(RuleNotApplicableToTokensException):
+        generate_grammar('<A> := @Name <B>\n<B> := "+" @Name', lexer=lexer)
+    grammar = generate_grammar('<A> := @Name <B>\n<B> := (@Operator @Name)* ""', lexer=lexer)
+    assert grammar.match_whole('a + b')
+
+    with pytest.raises(RuleNotApplicableToTokensException):
+        Grammar(Choices(Token('Number'), 'x'))
+    with pytest.raises(RuleNotApplicableToTokensException):
+        generate_grammar('<A> := @Number / "x"')
@@ -0,0 +1,68 @@
+import pytest
+
+from pegger.grammar import Grammar
+from pegger.grammar_parser import generate_grammar
+from pegger.lexer import Lexer
+from pegger.parallel import parse_records
+from pegger.rules import *
+
+
+grammar_definition = '<Record> := "ID" $[0-9]+ ":" <Field>* "\\n"\n' \
+                     '<Field> := " " ([a-z] / "\\nID" ![0-9])+'
+
+def tree(node):
+    return node.rule_type, node.name, node.start_pos, node.end_pos, [tree(child) for child in node.children]
+
+def test_parse_records():
+    grammar = generate_grammar(grammar_definition.replace('\\n', '\n'))
+    record = grammar.aliases['Record']
+    # the fields of some records contain the resynchronization pattern
+    string = ''.join('ID{}: ab{}\n'.format(i, '\nID' * (i % 3) + ' cd' * (i % 5)) for i in range(200))
+    expected = tree(ZeroOrMore(record).parse(string))
+
+    for chunks in [2, 7, 50]:
+        result = grammar.parse_records(string, 'Record', '\n(?=ID)', processes=3, chunks=chunks)
+        assert result.string is string
+        assert result.end_pos == len(string)
+        assert tree(result) == expected
+        assert result.children[-1].match_string == 'ID199: ab\nID cd cd cd cd\n'
+
+    # the last chunk does not parse completely
+    result = grammar.parse_records(string[:-20] + 'ID?' + string[-20:], 'Record', '\n(?=ID)', processes=2, chunks=5)
+    assert tree(result) == tree(ZeroOrMore(record).parse(string[:-20] + 'ID?' + string[-20:]))
+
+def test_parse_records_with_lexer():
+    lexer = Lexer([('Id', r'[0-9]+'), ('Word', r'[a-z]+'), ('End', r';'), ('Space', r'\s+')], skip=['Space'])
+    record = Sequence(Token('Id'), ZeroOrMore(Choices(Token('Word'), Token('Id'))), Token('End'))
+    string = ' '.join('{} a b {};'.format(i, i + 1) for i in range(100))
+
+    result = parse_records(record, string, ';', processes=2, chunks=4, lexer=lexer)
+    assert tree(result) == tree(ZeroOrMore(record).parse(lexer.tokenize(string)))
+    assert len(result.children) == 100
+
+def test_parse_records_lazily():
+    record = Sequence(OneOrMore(Range('a', 'z')), Choices(';', Sequence('!', Optional(' ')).drop())).hide()
+    string = ''.join('ab;' if i % 3 else 'cd! ' for i in range(100))
+
+    result = parse_records(record, string, '[;!] ?', processes=2, chunks=4)
+    assert tree(result) == tree(ZeroOrMore(record).parse(string))
+    assert len(result.children) == 200
+    assert result.children[-1].match_string == '! '
+
+    record = Sequence(OneOrMore(Range('a', 'z')), ';')
+    result = parse_records(record, 'ab;' * 100, ';', processes=2, chunks=4)
+    # the nodes of the records are created on first access
+    assert sum(isinstance(item, tuple) for item in result.children.items) > 50
+    assert [child.match_string for child in result.children[1:3]] == ['ab;', 'ab;']
+    assert result.children[1] is result.children[1]
+
+def test_parse_records_failure():
+    lexer = Lexer([('Word', r'[a-z]+'), ('End', r';'), ('Space', r'\s+')], skip=['Space'])
+    grammar = Grammar(Sequence(Token('Word'), Token('End')), lexer=lexer)
+
+    result = grammar.parse_records('a; b; c;', grammar.base_rule, ';', processes=2)
+    assert len(result.children) == 3
+    failure = grammar.parse_records('a; b; 1;', grammar.base_rule, ';', processes=2)
+    assert not failure
+    assert failure.pos == 6
+    assert failure.expected == ['@End', '@Word']
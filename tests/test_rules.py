@@ -1,5 +1,6 @@
 import pytest
 
+import pegger.rules
 from pegger.grammar import Grammar
 from pegger.rules import *
 
@@ -25,3 +26,120 @@ def test_grammar():
     assert not grammar.match_whole('aabbbccc')
     assert not grammar.match_whole('aaabbccc')
     assert not grammar.match_whole('aaabbbcc')
+
+def test_actions():
+    calls = []
+    def to_int(node):
+        calls.append(node.start_pos)
+        return int(node.match_string)
+
+    number = OneOrMore(Range('0', '9')).set_action(to_int)
+    addition = Sequence(number, '+', number).set_action(lambda node: node.values[0] + node.values[2])
+    expression = Choices(addition, number)
+
+    result = expression.parse('12+30')
+    assert result.value == 42
+    assert result.children[0].children == []
+
+    # the failing alternative is not executed again
+    result = expression.parse('7-')
+    assert result.value == 7
+    assert result.end_pos == 1
+    assert calls == [0, 3, 0]
+
+def test_node_modes():
+    spacing = ZeroOrMore(' ').drop()
+    name = OneOrMore(Range('a', 'z')).as_token()
+    names = Sequence(name, ZeroOrMore(Sequence(spacing, ',', spacing, name).hide()).hide())
+
+    result = names.parse('ab , c,d')
+    assert [child.match_string for child in result.children] == ['ab', ',', 'c', ',', 'd']
+    assert all(child.children == [] for child in result.children)
+    assert result.end_pos == 8
+
+def test_parsing_failure():
+    digit = Range('0', '9')
+    item = Choices(OneOrMore(digit), Sequence('(', ZeroOrMore(digit), ')'))
+    grammar = Grammar(Sequence(item, ZeroOrMore(Sequence('\n', item)), Not(Any())))
+
+    assert grammar.parse('12\n(3)')
+
+    failure = grammar.parse('12\n(3x')
+    assert not failure
+    assert failure.pos == 5
+    assert (failure.line, failure.column) == (2, 3)
+    assert failure.expected == ['")"', '[0-9]']
+
+    failure = grammar.parse('12\n(3)x')
+    assert failure.pos == 6
+    assert failure.expected == ['!.', '"\\n"']
+    assert str(failure) == 'line 2, column 4: expected !., "\\n"'
+
+    failure = grammar.parse('12\n(3)x')
+    assert failure.pos == 6
+    assert failure.expected == ['!.', '"\\n"']
+
+    # results memoized without a failure tracker are parsed again
+    base_rule = grammar.base_rule
+    assert not base_rule.parse('(12x')
+    assert grammar.scan('(12x') == []
+    failure = Grammar(base_rule).parse('(12x')
+    assert failure.pos == 3
+    assert failure.expected == ['")"', '[0-9]']
+    assert grammar.parse('(12x').expected == ['")"', '[0-9]']
+
+def test_finditer():
+    number = Sequence(Optional('-'), OneOrMore(Range('0', '9')))
+    grammar = Grammar(Choices(number, Sequence('(', ZeroOrMore(Choices(number, ',')), ')')))
+
+    matches = grammar.scan('a 12, -3 (4,-5) - x 67')
+    assert [match.match_string for match in matches] == ['12', '-3', '(4,-5)', '67']
+    assert [match.start_pos for match in grammar.finditer('(,')] == []
+
+    grammar = Grammar(ZeroOrMore('a'))
+    assert [match.start_pos for match in grammar.finditer('baab a')] == [1, 5]
+
+    # the results memoized by a scan are not kept by the rules
+    digit = Range('0', '9')
+    grammar = Grammar(Sequence(OneOrMore(digit), Not('x')))
+    sizes = []
+    for i in range(3):
+        assert len(grammar.scan('1 23x 45 ' * 10 + str(i))) == 21
+        sizes.append(len(digit.tracked_memoization_dict))
+    assert sizes == [sizes[0]] * 3
+    assert len(digit.memoization_dict) == 0
+
+def test_node_modes_allocation(monkeypatch):
+    created = []
+    class CountedParsingSuccess(ParsingSuccess):
+        def __init__(self, *args):
+            super().__init__(*args)
+            created.append(self)
+    monkeypatch.setattr(pegger.rules, 'ParsingSuccess', CountedParsingSuccess)
+
+    string = 'ab cd ef ' * 100
+    result = ZeroOrMore(Sequence(OneOrMore(Range('a', 'z')), ZeroOrMore(' '))).parse(string)
+    count = len(created)
+    del created[:]
+
+    # the modes are applied to the nodes created by the rules, without creating new ones
+    word = OneOrMore(Range('a', 'z')).as_token()
+    pruned_result = ZeroOrMore(Sequence(word, ZeroOrMore(' ').drop()).hide()).parse(string)
+    assert len(created) == count
+    assert len(pruned_result.children) == 300
+    assert pruned_result.end_pos == result.end_pos
+    # within tokens and dropped nodes no children are added, only the hidden sequences and the result have some
+    assert sum(len(node.children) for node in created) == 600
+    # which are kept apart from the results of the same rules outside of tokens
+    assert len(OneOrMore(word.rule).parse(string).children) == 2
+
+    # the results of aliases are copied, since they are memoized by the aliased rule as well
+    word_result = word.parse(string, 3)
+    assert RuleAlias(None, word).set_action(lambda node: node.match_string).parse(string, 3).value == 'cd'
+    assert word.parse(string, 3) is word_result
+    assert word_result.value is None
+
+    # a hidden node with a value is kept, since splicing it would lose the value
+    number = OneOrMore(Range('0', '9')).set_action(lambda node: int(node.match_string)).hide()
+    assert Sequence(number, ';').parse('12;').values == [12, None]
+    assert Sequence(Sequence(RuleAlias(None, number).hide(), ';').hide(), number).parse('1;2').values == [1, None, 2]